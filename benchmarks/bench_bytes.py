@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: MIT
+# Copyright 2022, Even Rouault
+
+""" Benchmark of to_wkt_bytes() with a streaming zlib compressor, compared
+    to compressing the encoded result of to_wkt(), on the generated corpus
+    and on a very large CompoundCRS. Reports the best time and the peak
+    traced memory of each path.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import projjson_to_wkt  # noqa: E402
+from bench_parallel import compound_crs  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+
+def encode_then_compress(projjson):
+    return zlib.compress(projjson_to_wkt.to_wkt(projjson).encode("utf-8"))
+
+
+def streaming_compress(projjson):
+    return projjson_to_wkt.to_wkt_bytes(projjson,
+                                        compressor=zlib.compressobj())
+
+
+def bench(projjsons, converts, repeat):
+    """ Return the best time and the peak traced memory of each conversion
+        function. Runs are interleaved, so that they are similarly affected
+        by the load of the machine. """
+
+    best = [None] * len(converts)
+    for _ in range(repeat):
+        for i, convert in enumerate(converts):
+            start = time.perf_counter()
+            for projjson in projjsons:
+                convert(projjson)
+            duration = time.perf_counter() - start
+            best[i] = duration if best[i] is None else min(best[i], duration)
+
+    peaks = []
+    for convert in converts:
+        tracemalloc.start()
+        try:
+            for projjson in projjsons:
+                convert(projjson)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return zip(best, peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--components", type=int, default=64)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, projjsons in (
+            ("%d generated CRSs" % args.count, generate_corpus(args.count)),
+            ("CompoundCRS of %d components" % args.components,
+             [compound_crs(args.components, args.members)])):
+        for projjson in projjsons:
+            assert zlib.decompress(streaming_compress(projjson)) == \
+                projjson_to_wkt.to_wkt(projjson).encode("utf-8")
+        print(name)
+        converts = (("encode then compress", encode_then_compress),
+                    ("streaming compress", streaming_compress))
+        results = bench(projjsons, [convert for _, convert in converts],
+                        args.repeat)
+        for (convert_name, _), (duration, peak) in zip(converts, results):
+            print("    %-21s %.3f s, peak memory %.1f MB" % (
+                convert_name, duration, peak / 1e6))
+
+
+if __name__ == "__main__":
+    main()
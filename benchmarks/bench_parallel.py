@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: MIT
+# Copyright 2022, Even Rouault
+
+""" Benchmark of the parallel rendering of CompoundCRS and BoundCRS
+    subtrees on very large synthetic CRSs.
+
+    Threads only give a speed-up on free-threaded Python builds. Process and
+    interpreter pools pay the cost of transferring the PROJJSON subtrees.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import projjson_to_wkt  # noqa: E402
+
+
+def geographic_crs(i, member_count):
+    return {"type": "GeographicCRS", "name": "Geographic CRS %d" % i,
+            "datum_ensemble": {
+                "name": "Ensemble %d" % i,
+                "members": [{"name": "Member %d.%d" % (i, j),
+                             "id": {"authority": "TEST", "code": j}}
+                            for j in range(member_count)],
+                "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137,
+                              "inverse_flattening": 298.257223563},
+                "accuracy": "2.0"},
+            "coordinate_system": {
+                "subtype": "ellipsoidal",
+                "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat",
+                          "direction": "north", "unit": "degree"},
+                         {"name": "Geodetic longitude", "abbreviation": "Lon",
+                          "direction": "east", "unit": "degree"}]},
+            "scope": "Benchmark.", "area": "World.",
+            "id": {"authority": "TEST", "code": i}}
+
+
+def compound_crs(component_count, member_count):
+    return {"type": "CompoundCRS", "name": "Synthetic compound CRS",
+            "components": [geographic_crs(i, member_count)
+                           for i in range(component_count)]}
+
+
+def bound_crs(component_count, member_count):
+    half = max(component_count // 2, 1)
+    return {"type": "BoundCRS",
+            "source_crs": compound_crs(half, member_count),
+            "target_crs": compound_crs(half, member_count),
+            "transformation": {
+                "name": "Synthetic transformation",
+                "method": {"name": "Geocentric translations"},
+                "parameters": [{"name": "Parameter %d" % i, "value": i,
+                                "unit": "metre"}
+                               for i in range(member_count)]}}
+
+
+def bench(projjson, executor, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        wkt = projjson_to_wkt.to_wkt(projjson, executor=executor)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, wkt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--components", type=int, default=64)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("Python %s, GIL %s, %d workers" % (
+        sys.version.split()[0], "enabled" if gil else "disabled",
+        args.workers))
+
+    executors = [("thread", concurrent.futures.ThreadPoolExecutor),
+                 ("process", concurrent.futures.ProcessPoolExecutor)]
+    if hasattr(concurrent.futures, "InterpreterPoolExecutor"):
+        executors.append(
+            ("interpreter", concurrent.futures.InterpreterPoolExecutor))
+
+    for name, projjson in (
+            ("CompoundCRS", compound_crs(args.components, args.members)),
+            ("BoundCRS", bound_crs(args.components, args.members))):
+        serial, ref_wkt = bench(projjson, None, args.repeat)
+        print("%s: %d bytes, serial %.3f s" % (name, len(ref_wkt), serial))
+        for executor_name, executor_class in executors:
+            with executor_class(max_workers=args.workers) as executor:
+                duration, wkt = bench(projjson, executor, args.repeat)
+            assert wkt == ref_wkt
+            print("    %-11s %.3f s (x%.2f)" % (
+                executor_name, duration, serial / duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: MIT
+# Copyright 2022, Even Rouault
+
+""" Benchmark of string emission on a corpus of CRSs with long names, scopes,
+    areas and remarks, compared to the previous emitter, which escaped every
+    string with replace() and concatenated the output to a str attribute.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import projjson_to_wkt  # noqa: E402
+
+
+class LegacyPROJJSONToWKT(projjson_to_wkt.PROJJSONToWKT):
+    """ Emulation of the previous str concatenation based emitter """
+
+    def __init__(self, options):
+        projjson_to_wkt.PROJJSONToWKT.__init__(self, options)
+        self.legacy_wkt = ""
+
+    def write(self, s):
+        self.legacy_wkt += s
+
+    def output_size(self):
+        return len(self.legacy_wkt)
+
+    def add_quoted_string(self, s):
+        if self.stack_has_values[-1]:
+            self.write(",")
+        self.write("\"" + s.replace("\"", "\"\"") + "\"")
+        self.stack_has_values[-1] = True
+
+    def to_wkt(self, projjson):
+        self.crs_to_wkt(projjson)
+        return self.legacy_wkt
+
+
+def long_text_crs(i, text_length):
+    text = ("Lorem ipsum dolor sit amet %d; " % i) * \
+        (text_length // 30 + 1)
+    return {"type": "VerticalCRS", "name": "Vertical CRS %d" % i,
+            "datum": {"type": "VerticalReferenceFrame",
+                      "name": "Datum %d" % i, "remarks": text},
+            "coordinate_system": {
+                "subtype": "vertical",
+                "axis": [{"name": "Gravity-related height",
+                          "abbreviation": "H", "direction": "up",
+                          "unit": "metre"}]},
+            "usages": [{"scope": text, "area": text} for _ in range(4)],
+            "remarks": "Remarks with \"quotes\". " + text,
+            "id": {"authority": "TEST", "code": i}}
+
+
+def bench(corpus, factory, options, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for projjson in corpus:
+            factory(options).to_wkt(projjson)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--text-length", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = [long_text_crs(i, args.text_length) for i in range(args.count)]
+    options = projjson_to_wkt.Options()
+    for projjson in corpus:
+        assert LegacyPROJJSONToWKT(options).to_wkt(projjson) == \
+            projjson_to_wkt.to_wkt(projjson, options)
+
+    legacy = bench(corpus, LegacyPROJJSONToWKT, options, args.repeat)
+    current = bench(corpus, projjson_to_wkt.PROJJSONToWKT,
+                    options, args.repeat)
+    print("%d CRSs with %d character strings" % (args.count, args.text_length))
+    print("    legacy  %.3f s" % legacy)
+    print("    current %.3f s (x%.2f)" % (current, legacy / current))
+
+
+if __name__ == "__main__":
+    main()
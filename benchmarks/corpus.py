@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: MIT
+# Copyright 2022, Even Rouault
+
+""" Deterministic generator of a corpus of realistic PROJJSON CRSs, expanded
+    from the EPSG fixtures of tests/tests.py by mutating names, parameters,
+    datum ensemble sizes, usages and nesting (CompoundCRS and BoundCRS).
+"""
+
+import argparse
+import ast
+import copy
+import json
+import os
+import random
+import re
+
+TESTS_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "tests.py")
+
+WORDS = ("North", "South", "East", "West", "Grid", "Zone", "Local", "Datum",
+         "Survey", "Island", "Coast", "Mountain", "River", "Lake", "Harbour")
+
+
+def load_fixtures(path=TESTS_PATH):
+    """ Return the PROJJSON dictionaries assigned to j in the
+        test_*_epsg_XXXX() functions, sorted by function name """
+
+    fixtures = []
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or \
+                not re.match(r"test_.*_epsg_\d+$", node.name):
+            continue
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and \
+                    isinstance(statement.targets[0], ast.Name) and \
+                    statement.targets[0].id == "j":
+                fixtures.append((node.name, ast.literal_eval(statement.value)))
+                break
+    return [projjson for _, projjson in sorted(fixtures)]
+
+
+def mutated_name(rng, name):
+    r = rng.random()
+    if r < 0.5:
+        return "%s %s %d" % (name, rng.choice(WORDS), rng.randrange(1000))
+    if r < 0.6:
+        return "%s \"%s\"" % (name, rng.choice(WORDS))
+    if r < 0.7:
+        return name + " / " + " ".join(rng.choice(WORDS)
+                                       for _ in range(rng.randrange(5, 20)))
+    return name
+
+
+def mutate(rng, obj):
+    """ Mutate in place the names, parameters, ensembles and usages of a
+        PROJJSON tree """
+
+    if isinstance(obj, list):
+        for v in obj:
+            mutate(rng, v)
+        return
+    if not isinstance(obj, dict):
+        return
+
+    if isinstance(obj.get("name", None), str) and "abbreviation" not in obj \
+            and obj.get("type", None) not in ("LinearUnit", "AngularUnit"):
+        obj["name"] = mutated_name(rng, obj["name"])
+
+    if "value" in obj and isinstance(obj["value"], (int, float)):
+        obj["value"] = round(obj["value"] + rng.uniform(-10, 10), 6)
+
+    members = obj.get("members", None)
+    if members:
+        count = rng.choice((1, len(members), len(members) * 4))
+        obj["members"] = [
+            {"name": "%s (R%d)" % (members[i % len(members)]["name"], i),
+             "id": {"authority": "EPSG", "code": 10000 + i}}
+            for i in range(count)]
+
+    if "area" in obj and rng.random() < 0.3:
+        obj["area"] = " ".join([obj["area"]] * rng.randrange(1, 5))
+    if rng.random() < 0.05:
+        obj["remarks"] = "Generated. " * rng.randrange(1, 50)
+    if "scope" in obj and rng.random() < 0.1:
+        usage = {k: obj.pop(k) for k in ("scope", "area", "bbox") if k in obj}
+        obj["usages"] = [dict(usage) for _ in range(rng.randrange(1, 4))]
+
+    for k, v in obj.items():
+        if k not in ("members", "id", "bbox", "usages"):
+            mutate(rng, v)
+
+
+def nested(rng, fixtures):
+    """ Return a CompoundCRS or BoundCRS built from several fixtures """
+
+    horizontal = [f for f in fixtures if f["type"] != "VerticalCRS"]
+    vertical = [f for f in fixtures if f["type"] == "VerticalCRS"]
+    if rng.random() < 0.5:
+        return {"type": "CompoundCRS", "name": "Generated compound CRS",
+                "components": [copy.deepcopy(rng.choice(horizontal)),
+                               copy.deepcopy(rng.choice(vertical))],
+                "scope": "Generated.", "area": "World.",
+                "id": {"authority": "TEST", "code": rng.randrange(100000)}}
+    return {"type": "BoundCRS",
+            "source_crs": copy.deepcopy(rng.choice(fixtures)),
+            "target_crs": copy.deepcopy(horizontal[0]),
+            "transformation": {
+                "name": "Generated transformation",
+                "method": {"name": "Position Vector transformation "
+                           "(geog2D domain)"},
+                "parameters": [
+                    {"name": "Parameter %d" % i,
+                     "value": rng.uniform(-100, 100), "unit": "metre"}
+                    for i in range(rng.randrange(3, 8))]}}
+
+
+def generate_corpus(count, seed=0, fixtures=None):
+    """ Return a list of count PROJJSON dictionaries. The same count and
+        seed always give the same corpus. """
+
+    if fixtures is None:
+        fixtures = load_fixtures()
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            projjson = nested(rng, fixtures)
+        else:
+            projjson = copy.deepcopy(fixtures[i % len(fixtures)])
+        mutate(rng, projjson)
+        corpus.append(projjson)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("output", help="Output file, one PROJJSON per line")
+    args = parser.parse_args()
+
+    with open(args.output, "w") as f:
+        for projjson in generate_corpus(args.count, args.seed):
+            f.write(json.dumps(projjson) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: MIT
+# Copyright 2022, Even Rouault
+
+""" Performance regression gate for to_wkt() over a generated corpus.
+
+    Measures the throughput (conversions per second, best of several runs),
+    the peak traced memory when keeping all the WKT strings, and the mean
+    peak traced memory allocated by a single conversion (CPython has no
+    cheap counter of allocations). With --update-baseline, stores them in
+    the baseline file. Otherwise compares them with the baseline and exits
+    with an error code when one of them is worse than its threshold.
+
+    The throughput depends on the machine, and is checked manually against
+    the local, git-ignored, baseline.local.json. The memory metrics are
+    deterministic for a given Python version, and checked in CI with
+    --memory-only against the committed baseline.json, computed with the
+    Python version of CI.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import projjson_to_wkt  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+# Baseline of the manual checks, including the throughput of this machine
+LOCAL_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.local.json")
+# Committed baseline of the memory metrics, checked in CI
+MEMORY_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metric name, whether higher is better, threshold argument
+METRICS = (("throughput", True, "throughput_threshold"),
+           ("peak_memory", False, "memory_threshold"),
+           ("peak_bytes_per_conversion", False, "memory_threshold"))
+
+
+def measure(corpus, options, repeat):
+    """ Return the dictionary of metrics. The throughput is not measured if
+        repeat is 0. """
+
+    results = {}
+    best = None
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for projjson in corpus:
+                projjson_to_wkt.to_wkt(projjson, options)
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+    finally:
+        gc.enable()
+    if best is not None:
+        results["throughput"] = len(corpus) / best
+
+    tracemalloc.start()
+    try:
+        total = 0
+        for projjson in corpus:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            wkt = projjson_to_wkt.to_wkt(projjson, options)
+            total += tracemalloc.get_traced_memory()[1] - before
+            del wkt
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        wkts = [projjson_to_wkt.to_wkt(projjson, options)
+                for projjson in corpus]
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        del wkts
+    finally:
+        tracemalloc.stop()
+
+    results["peak_memory"] = peak_memory
+    results["peak_bytes_per_conversion"] = total / len(corpus)
+    return results
+
+
+def compare(results, baseline, thresholds):
+    """ Print the comparison of the results with the baseline and return
+        the names of the regressed metrics. Metrics missing from the
+        results are skipped. """
+
+    regressions = []
+    for name, higher_is_better, threshold_name in METRICS:
+        if name not in results:
+            continue
+        threshold = thresholds[threshold_name]
+        value = results[name]
+        reference = baseline[name]
+        change = (value - reference) / reference
+        if higher_is_better:
+            change = -change
+        status = "REGRESSION" if change > threshold else "ok"
+        print("%-26s %14.1f  baseline %14.1f  %+6.1f%%  %s" % (
+            name, value, reference,
+            100 * (value - reference) / reference, status))
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--format", default=projjson_to_wkt.WKT2_2019,
+                        choices=(projjson_to_wkt.WKT2_2019,
+                                 projjson_to_wkt.WKT1))
+    parser.add_argument("--single-line", action="store_true")
+    parser.add_argument("--baseline",
+                        help="Baseline file. Defaults to %s, or with "
+                        "--memory-only to %s" % (
+                            os.path.basename(LOCAL_BASELINE),
+                            os.path.basename(MEMORY_BASELINE)))
+    parser.add_argument("--throughput-threshold", type=float, default=0.15,
+                        help="Maximum relative decrease of the throughput")
+    parser.add_argument("--memory-threshold", type=float, default=0.05,
+                        help="Maximum relative increase of the memory metrics")
+    parser.add_argument("--memory-only", action="store_true",
+                        help="Do not measure the throughput")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    if args.baseline is None:
+        args.baseline = MEMORY_BASELINE if args.memory_only else \
+            LOCAL_BASELINE
+
+    corpus = generate_corpus(args.count, args.seed)
+    options = projjson_to_wkt.Options(format=args.format,
+                                      single_line=args.single_line)
+    if args.format == projjson_to_wkt.WKT1:
+        corpus = [projjson for projjson in corpus
+                  if projjson["type"] != "BoundCRS"]
+    results = measure(corpus, options, 0 if args.memory_only else args.repeat)
+    results["corpus"] = {"count": args.count, "seed": args.seed,
+                         "format": args.format,
+                         "single_line": args.single_line}
+    # Object sizes, and thus the memory metrics, depend on the Python version
+    results["python"] = ".".join(platform.python_version_tuple()[0:2])
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Baseline written to %s" % args.baseline)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("corpus", None) != results["corpus"]:
+        print("Baseline was computed on a different corpus: %s" %
+              baseline.get("corpus", None))
+        return 1
+    if baseline.get("python", None) != results["python"]:
+        print("Baseline was computed with Python %s" %
+              baseline.get("python", None))
+        return 1
+    regressions = compare(results, baseline, vars(args))
+    if regressions:
+        print("Performance regression: %s" % ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,30 +2,80 @@
 # SPDX-License-Identifier: MIT
 # Copyright 2022, Even Rouault
 
+import hashlib
+import re
+import threading
+
 WKT1 = "WKT1"
 WKT2_2019 = "WKT2:2019"
 
 DEG_TO_RAD = 0.0174532925199433
 
 
+class LimitExceededException(Exception):
+    """ Raised when a conversion exceeds one of the limits of Options """
+
+
 class Options:
-    def __init__(self, format=WKT2_2019, single_line=False):
+    def __init__(self, format=WKT2_2019, single_line=False,
+                 max_output_size=None, max_depth=None, max_node_count=None,
+                 max_string_length=None, registry=None):
+        """ max_output_size: maximum size of the WKT string, in characters
+                (in bytes for PROJJSONToWKTBytes)
+            max_depth: maximum nesting level of WKT nodes
+            max_node_count: maximum number of WKT nodes
+            max_string_length: maximum length of an emitted string or value
+            registry: optional WKTRegistry of pre-rendered objects. Limits
+                other than max_output_size are not applied to its fragments.
+        """
         if format not in (WKT1, WKT2_2019,):
             raise Exception("Unsupported WKT format")
         self.format = format
         self.single_line = single_line
         self.indentation_by_level = "" if single_line else " " * 4
+        self.max_output_size = max_output_size
+        self.max_depth = max_depth
+        self.max_node_count = max_node_count
+        self.max_string_length = max_string_length
+        self.registry = registry
+        self.has_limits = (max_output_size is not None or
+                           max_depth is not None or
+                           max_node_count is not None or
+                           max_string_length is not None)
 
 
 class PROJJSONToWKT:
-    def __init__(self, options=Options()):
+    def __init__(self, options=Options(), executor=None):
+        """ executor: optional concurrent.futures.Executor used to render
+            the components of CompoundCRS and the source CRS, target CRS and
+            transformation of BoundCRS in parallel """
         self.options = options
-        self.wkt = ""
+        self.executor = executor
+        # Output pieces, joined once by the wkt property
+        self.pieces = []
+        self.size = 0
+        self.escaped_strings = {}
         self.stack_has_values = []
         self.indentation = ""
+        # Number of open WKT nodes, not counting pseudo nodes
+        self.node_depth = 0
+        self.node_count = 0
+
+    @property
+    def wkt(self):
+        return "".join(self.pieces)
+
+    def escape_str(self, x):
+        if "\"" not in x:
+            return x
+        escaped = self.escaped_strings.get(x, None)
+        if escaped is None:
+            escaped = x.replace("\"", "\"\"")
+            self.escaped_strings[x] = escaped
+        return escaped
 
     def quote_str(self, x):
-        return "\"" + x.replace("\"", "\"\"") + "\""
+        return "\"" + self.escape_str(x) + "\""
 
     def float_to_str(self, v):
         return "%.15g" % v
@@ -43,23 +93,65 @@ class PROJJSONToWKT:
             return val, unit["name"], conv_factor
         return v, default_unit, (DEG_TO_RAD if default_unit == "degree" else 1.0)
 
-    def start_node(self, name):
+    def write(self, s):
+        self.pieces.append(s)
+        self.size += len(s)
+
+    def output_size(self):
+        return self.size
+
+    def check_output_size(self):
+        max_output_size = self.options.max_output_size
+        if max_output_size is not None and self.output_size() > max_output_size:
+            raise LimitExceededException(
+                "WKT output exceeds %d characters" % max_output_size)
+
+    def check_string_length(self, s):
+        max_string_length = self.options.max_string_length
+        if max_string_length is not None and len(s) > max_string_length:
+            raise LimitExceededException(
+                "String exceeds %d characters" % max_string_length)
+
+    def check_node_count(self):
+        max_node_count = self.options.max_node_count
+        if max_node_count is not None and self.node_count > max_node_count:
+            raise LimitExceededException(
+                "WKT exceeds %d nodes" % max_node_count)
+
+    def check_node_limits(self):
+        max_depth = self.options.max_depth
+        if max_depth is not None and self.node_depth >= max_depth:
+            raise LimitExceededException(
+                "WKT nesting exceeds %d levels" % max_depth)
+        self.check_node_count()
+        self.check_output_size()
+
+    def node_prefix(self):
+        """ Return the separator and indentation to emit before a node """
+
+        prefix = self.indentation
         if self.stack_has_values:
+            if not self.options.single_line:
+                prefix = "\n" + prefix
             if self.stack_has_values[-1]:
-                self.wkt += ","
+                prefix = "," + prefix
             else:
                 self.stack_has_values[-1] = True
-            if not self.options.single_line:
-                self.wkt += "\n"
-        self.wkt += self.indentation
-        self.wkt += name
-        self.wkt += "["
+        return prefix
+
+    def start_node(self, name):
+        if self.options.has_limits:
+            self.node_count += 1
+            self.check_node_limits()
+        self.write(self.node_prefix() + name + "[")
         self.stack_has_values.append(False)
         self.indentation += self.options.indentation_by_level
+        self.node_depth += 1
 
     def end_node(self):
-        self.wkt += "]"
+        self.write("]")
         self.end_pseudo_node()
+        self.node_depth -= 1
 
     def start_pseudo_node(self):
         self.stack_has_values.append(True)
@@ -71,17 +163,81 @@ class PROJJSONToWKT:
                                             len(self.options.indentation_by_level)]
 
     def add_quoted_string(self, s):
-        if self.stack_has_values[-1]:
-            self.wkt += ","
-        self.wkt += self.quote_str(s)
+        if self.options.has_limits:
+            self.check_string_length(s)
+            self.check_output_size()
+        # Write the quotes and the string as separate pieces, so that the
+        # string is not copied
+        self.write(",\"" if self.stack_has_values[-1] else "\"")
+        self.write(self.escape_str(s))
+        self.write("\"")
         self.stack_has_values[-1] = True
 
     def add(self, s):
+        if self.options.has_limits:
+            self.check_string_length(s)
+            self.check_output_size()
         if self.stack_has_values[-1]:
-            self.wkt += ","
-        self.wkt += s
+            self.write(",")
+        self.write(s)
+        self.stack_has_values[-1] = True
+
+    def siblings_to_wkt(self, tasks):
+        """ Render a list of (method name, object) tasks, each emitting
+            sibling nodes, in parallel if an executor is set """
+
+        if self.executor is None or len(tasks) < 2:
+            for method, obj in tasks:
+                getattr(self, method)(obj)
+            return
+
+        # The rendering of a node only depends on whether it is the first
+        # value of its parent and on its indentation.
+        stack_has_values = list(self.stack_has_values)
+        futures = []
+        for method, obj in tasks:
+            futures.append(self.executor.submit(
+                _render_fragment, self.options, list(stack_has_values),
+                self.indentation, self.node_depth, method, obj))
+            stack_has_values[-1] = True
+        for future in futures:
+            wkt, node_count = future.result()
+            self.write(wkt)
+            if self.options.has_limits:
+                self.node_count += node_count
+                self.check_node_count()
+                self.check_output_size()
         self.stack_has_values[-1] = True
 
+    def registry_to_wkt(self, kind, obj):
+        """ Emit the fragment of options.registry of the given kind (see
+            WKTRegistry.KIND_METHODS) for the id of obj, and return True, or
+            return False if there is none or obj is not reduced to its id """
+
+        id = obj.get("id", None)
+        if not id:
+            return False
+        for k in obj:
+            if k not in WKTRegistry.THIN_OBJECT_KEYS:
+                return False
+        fragment = self.options.registry.lookup(
+            id["authority"], id["code"], self.options.format, kind,
+            self.options.single_line)
+        if fragment is None:
+            return False
+        self.write_fragment(fragment)
+        return True
+
+    def write_fragment(self, fragment):
+        """ Emit a WKT fragment rendered at indentation level 0 """
+
+        self.write(self.node_prefix())
+        if self.indentation:
+            fragment = fragment.replace("\n", "\n" + self.indentation)
+        self.write(fragment)
+        if self.options.has_limits:
+            self.check_output_size()
+
     def id_to_wkt(self, id):
         if self.options.format == WKT1:
             self.start_node("AUTHORITY")
@@ -195,6 +351,9 @@ class PROJJSONToWKT:
 
     def datum_to_wkt(self, datum):
 
+        if self.options.registry is not None and \
+                self.registry_to_wkt("datum", datum):
+            return
         if self.options.format != WKT1:
             type = datum.get("type", None)
             if type and type == "DynamicGeodeticReferenceFrame":
@@ -218,6 +377,9 @@ class PROJJSONToWKT:
 
     def datum_ensemble_to_wkt(self, ensemble):
 
+        if self.options.registry is not None and \
+                self.registry_to_wkt("ensemble", ensemble):
+            return
         if self.options.format == WKT1:
             self.start_node("DATUM")
             self.add_quoted_string(ensemble["name"].replace(" ensemble", ""))
@@ -435,6 +597,9 @@ class PROJJSONToWKT:
 
     def vertical_datum_to_wkt(self, datum):
 
+        if self.options.registry is not None and \
+                self.registry_to_wkt("vertical_datum", datum):
+            return
         if self.options.format != WKT1:
             type = datum.get("type", None)
             if type and type == "DynamicVerticalReferenceFrame":
@@ -454,6 +619,9 @@ class PROJJSONToWKT:
 
     def vertical_datum_ensemble_to_wkt(self, ensemble):
 
+        if self.options.registry is not None and \
+                self.registry_to_wkt("vertical_ensemble", ensemble):
+            return
         if self.options.format == WKT1:
             self.start_node("VERT_DATUM")
             self.add_quoted_string(ensemble["name"])
@@ -495,8 +663,8 @@ class PROJJSONToWKT:
                         WKT1 else "COMPD_CS")
         self.add_quoted_string(crs["name"])
         components = crs["components"]
-        for component in components:
-            self.to_wkt(component)
+        self.siblings_to_wkt([("crs_to_wkt", component)
+                              for component in components])
         self.object_usage_to_wkt(crs)
         self.end_node()
 
@@ -517,16 +685,29 @@ class PROJJSONToWKT:
             raise Exception("BoundCRS unsupported in WKT1")
 
         self.start_node("BOUNDCRS")
+        self.siblings_to_wkt([
+            ("source_crs_to_wkt", crs["source_crs"]),
+            ("target_crs_to_wkt", crs["target_crs"]),
+            ("abridged_transformation_to_wkt", crs["transformation"])])
+        self.end_node()
+
+    def source_crs_to_wkt(self, crs):
+
         self.start_node("SOURCECRS")
-        self.to_wkt(crs["source_crs"])
+        self.crs_to_wkt(crs)
         self.end_node()
+
+    def target_crs_to_wkt(self, crs):
+
         self.start_node("TARGETCRS")
-        self.to_wkt(crs["target_crs"])
-        self.end_node()
-        self.abridged_transformation_to_wkt(crs["transformation"])
+        self.crs_to_wkt(crs)
         self.end_node()
 
-    def to_wkt(self, projjson):
+    def crs_to_wkt(self, projjson):
+
+        if self.options.registry is not None and \
+                self.registry_to_wkt("crs", projjson):
+            return
 
         type = projjson["type"]
         if type in ("GeodeticCRS", "GeographicCRS"):
@@ -544,12 +725,887 @@ class PROJJSONToWKT:
         else:
             raise Exception("Unsupported object type: %s" % type)
 
+    def to_wkt(self, projjson):
+
+        self.crs_to_wkt(projjson)
+        if self.options.has_limits:
+            self.check_output_size()
         return self.wkt
 
 
-def to_wkt(projjson, options=Options()):
+def _render_fragment(options, stack_has_values, indentation, node_depth,
+                     method, obj):
+    """ Render obj with the given PROJJSONToWKT method and emitter state.
+        Used by PROJJSONToWKT.siblings_to_wkt() in worker threads, processes
+        or interpreters. """
+
+    writer = PROJJSONToWKT(options)
+    writer.stack_has_values = stack_has_values
+    writer.indentation = indentation
+    writer.node_depth = node_depth
+    getattr(writer, method)(obj)
+    return writer.wkt, writer.node_count
+
+
+def to_wkt(projjson, options=Options(), executor=None):
     """ Convert a PROJJSON dictionary into a WKT string """
-    return PROJJSONToWKT(options).to_wkt(projjson)
+    return PROJJSONToWKT(options, executor).to_wkt(projjson)
+
+
+class _DeferringPROJJSONToWKT(PROJJSONToWKT):
+    """ Emits the sibling subtrees of CompoundCRS and BoundCRS as
+        (stack_has_values, indentation, node_depth, method, object) pieces,
+        rendered
+        later by _iter_wkt() """
+
+    def siblings_to_wkt(self, tasks):
+
+        stack_has_values = list(self.stack_has_values)
+        for method, obj in tasks:
+            self.pieces.append((list(stack_has_values), self.indentation,
+                                self.node_depth, method, obj))
+            stack_has_values[-1] = True
+        self.stack_has_values[-1] = True
+
+
+def _iter_wkt(options, stack_has_values, indentation, node_depth, method,
+              obj, totals):
+    """ Yield the WKT of obj by chunks, rendering each CompoundCRS
+        component or BoundCRS subtree when it is reached.
+        totals is the [size, node_count] list of the output rendered so far,
+        updated in place, against which the limits of options are checked. """
+
+    writer = _DeferringPROJJSONToWKT(options)
+    writer.stack_has_values = stack_has_values
+    writer.indentation = indentation
+    writer.node_depth = node_depth
+    writer.size, writer.node_count = totals
+    getattr(writer, method)(obj)
+    if options.has_limits:
+        writer.check_output_size()
+    totals[0] = writer.size
+    totals[1] = writer.node_count
+    start = 0
+    for i, piece in enumerate(writer.pieces):
+        if isinstance(piece, tuple):
+            if i > start:
+                yield "".join(writer.pieces[start:i])
+            yield from _iter_wkt(options, *piece, totals)
+            start = i + 1
+    if len(writer.pieces) > start:
+        yield "".join(writer.pieces[start:])
+
+
+class LazyWKT:
+    """ View of the WKT of a PROJJSON CRS, rendered on demand.
+
+        name and id are read from the PROJJSON dictionary. The components of
+        a CompoundCRS and the source and target CRS of a BoundCRS are
+        themselves LazyWKT objects. Iterating yields the WKT by chunks, each
+        CompoundCRS component or BoundCRS subtree being rendered only when
+        it is reached.
+    """
+
+    def __init__(self, projjson, options=Options()):
+        self.projjson = projjson
+        self.options = options
+        self.cached_wkt = None
+        self.cached_components = None
+        self.cached_source_crs = None
+        self.cached_target_crs = None
+
+    @property
+    def type(self):
+        return self.projjson["type"]
+
+    @property
+    def name(self):
+        return self.projjson.get("name", None)
+
+    @property
+    def id(self):
+        return self.projjson.get("id", None)
+
+    @property
+    def components(self):
+        if self.cached_components is None:
+            self.cached_components = [
+                LazyWKT(component, self.options)
+                for component in self.projjson["components"]]
+        return self.cached_components
+
+    @property
+    def source_crs(self):
+        if self.cached_source_crs is None:
+            self.cached_source_crs = LazyWKT(self.projjson["source_crs"],
+                                             self.options)
+        return self.cached_source_crs
+
+    @property
+    def target_crs(self):
+        if self.cached_target_crs is None:
+            self.cached_target_crs = LazyWKT(self.projjson["target_crs"],
+                                             self.options)
+        return self.cached_target_crs
+
+    @property
+    def wkt(self):
+        if self.cached_wkt is None:
+            self.cached_wkt = "".join(self)
+        return self.cached_wkt
+
+    def __str__(self):
+        return self.wkt
+
+    def __iter__(self):
+        if self.cached_wkt is not None:
+            return iter((self.cached_wkt,))
+        return _iter_wkt(self.options, [], "", 0, "crs_to_wkt",
+                         self.projjson, [0, 0])
+
+
+def to_wkt_lazy(projjson, options=Options()):
+    """ Return a LazyWKT view of a PROJJSON dictionary """
+    return LazyWKT(projjson, options)
+
+
+class PROJJSONToWKTBytes(PROJJSONToWKT):
+    """ Variant of PROJJSONToWKT that emits UTF-8 encoded WKT, and
+        optionally feeds it by chunks to a streaming compressor, such as
+        zlib.compressobj() or lzma.LZMACompressor(), so that the whole WKT
+        string is never held in memory.
+
+        The pieces of each chunk are joined and encoded at once, when a
+        node ends. max_output_size is checked in bytes on the encoded
+        chunks, characters not yet encoded being counted as one byte, and
+        exactly on the complete output. """
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, options=Options(), compressor=None):
+        PROJJSONToWKT.__init__(self, options)
+        self.compressor = compressor
+        self.compressed_chunks = []
+        # Number of characters and bytes encoded so far
+        self.encoded_size = 0
+        self.encoded_bytes = 0
+
+    def end_node(self):
+        PROJJSONToWKT.end_node(self)
+        if self.compressor is not None and \
+                self.size - self.encoded_size >= self.CHUNK_SIZE:
+            self.flush()
+
+    def encode(self):
+        data = "".join(self.pieces).encode("utf-8")
+        self.encoded_size = self.size
+        self.encoded_bytes += len(data)
+        return data
+
+    def flush(self):
+        self.compressed_chunks.append(self.compressor.compress(self.encode()))
+        self.pieces.clear()
+
+    def output_size(self):
+        return self.encoded_bytes + self.size - self.encoded_size
+
+    @property
+    def wkt(self):
+        if self.compressor is not None:
+            raise Exception("WKT string not available with a compressor")
+        return "".join(self.pieces)
+
+    def to_wkt(self, projjson):
+        """ Return the WKT string. Not available if a compressor is set. """
+
+        if self.compressor is not None:
+            raise Exception("WKT string not available with a compressor")
+        return PROJJSONToWKT.to_wkt(self, projjson)
+
+    def to_wkt_bytes(self, projjson):
+        """ Return the UTF-8 encoded WKT, or the complete compressed stream
+            if a compressor is set """
+
+        self.crs_to_wkt(projjson)
+        if self.compressor is None:
+            data = self.encode()
+        else:
+            self.flush()
+        if self.options.has_limits:
+            self.check_output_size()
+        if self.compressor is None:
+            return data
+        self.compressed_chunks.append(self.compressor.flush())
+        return b"".join(self.compressed_chunks)
+
+
+def to_wkt_bytes(projjson, options=Options(), compressor=None):
+    """ Convert a PROJJSON dictionary into UTF-8 encoded WKT bytes, or if
+        compressor is set, into the bytes of the compressed stream """
+    return PROJJSONToWKTBytes(options, compressor).to_wkt_bytes(projjson)
+
+
+class WKTRegistry:
+    """ Index of WKT fragments pre-rendered by create_wkt_registry(), stored
+        in a SQLite database and keyed by authority, code, WKT format and
+        kind of object.
+
+        Set as Options.registry, it lets the conversion of thin PROJJSON
+        objects, which only have a "type" and an "id", splice the
+        pre-rendered fragment of their id, so they can be used for
+        well-known CRSs, datums and datum ensembles. Other objects are
+        rendered from their content. Codes are looked up with their type:
+        an integer code does not match a string code. The prime meridian
+        of a datum is not part of its fragment.
+
+        The database is opened (read-only and memory-mapped) on the first
+        lookup, and looked up fragments are cached.
+    """
+
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    # PROJJSONToWKT method rendering each kind of object. Kinds are stored
+    # in the database, and must not change when methods are renamed.
+    KIND_METHODS = {"crs": "crs_to_wkt",
+                    "datum": "datum_to_wkt",
+                    "vertical_datum": "vertical_datum_to_wkt",
+                    "ensemble": "datum_ensemble_to_wkt",
+                    "vertical_ensemble": "vertical_datum_ensemble_to_wkt"}
+
+    # Keys of the objects replaced by their fragment
+    THIN_OBJECT_KEYS = ("$schema", "type", "id")
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.cache = {}
+        # Serializes the opening of the connection and its use
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections cannot be pickled: reopen the database on the first
+        # lookup in a worker process or interpreter
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def lookup(self, authority, code, format, kind, single_line):
+        """ Return the fragment rendered at indentation level 0, or None """
+
+        key = (authority, code, format, kind, single_line)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+
+        with self.lock:
+            if self.connection is None:
+                import pathlib
+                import sqlite3
+                self.connection = sqlite3.connect(
+                    pathlib.Path(self.path).resolve().as_uri() + "?mode=ro",
+                    uri=True, check_same_thread=False)
+                self.connection.execute(
+                    "PRAGMA mmap_size = %d" % self.MMAP_SIZE)
+            row = self.connection.execute(
+                "SELECT wkt, wkt_single_line FROM fragments WHERE "
+                "authority = ? AND code = ? AND format = ? AND kind = ?",
+                key[0:4]).fetchone()
+        fragment = None if row is None else row[1 if single_line else 0]
+        self.cache[key] = fragment
+        return fragment
+
+
+def _registry_kind(obj):
+    """ Return the WKTRegistry kind of a PROJJSON object, or None if it is
+        not supported """
+
+    type = obj.get("type", None)
+    if type in ("GeodeticCRS", "GeographicCRS", "DerivedGeodeticCRS",
+                "DerivedGeographicCRS", "ProjectedCRS", "VerticalCRS",
+                "CompoundCRS", "BoundCRS"):
+        return "crs"
+    if type in ("GeodeticReferenceFrame", "DynamicGeodeticReferenceFrame"):
+        return "datum"
+    if type in ("VerticalReferenceFrame", "DynamicVerticalReferenceFrame"):
+        return "vertical_datum"
+    if "members" in obj:
+        if "ellipsoid" in obj:
+            return "ensemble"
+        return "vertical_ensemble"
+    return None
+
+
+def _registry_objects(obj):
+    """ Yield (kind, object) for each object with an id in a PROJJSON
+        tree that WKTRegistry can store """
+
+    if isinstance(obj, dict):
+        if obj.get("id", None):
+            kind = _registry_kind(obj)
+            if kind:
+                yield kind, obj
+        for v in obj.values():
+            yield from _registry_objects(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _registry_objects(v)
+
+
+def create_wkt_registry(path, projjsons):
+    """ Create a SQLite database for WKTRegistry with the pre-rendered
+        fragments of the objects with an id found in the iterable of
+        PROJJSON dictionaries """
+
+    import sqlite3
+
+    connection = sqlite3.connect(path)
+    # code has no type affinity, so that integer and string codes, rendered
+    # differently, are distinct keys
+    connection.execute("CREATE TABLE IF NOT EXISTS fragments("
+                       "authority TEXT, code, format TEXT, kind TEXT, "
+                       "wkt TEXT, wkt_single_line TEXT, "
+                       "PRIMARY KEY(authority, code, format, kind))")
+    for projjson in projjsons:
+        for kind, obj in _registry_objects(projjson):
+            method = WKTRegistry.KIND_METHODS[kind]
+            for format in (WKT2_2019, WKT1):
+                fragments = []
+                for single_line in (False, True):
+                    writer = PROJJSONToWKT(
+                        Options(format=format, single_line=single_line))
+                    try:
+                        getattr(writer, method)(obj)
+                    except Exception:
+                        # e.g. object types unsupported in WKT1
+                        break
+                    fragments.append(writer.wkt)
+                # Fragments with new lines in strings cannot be re-indented
+                if len(fragments) != 2 or "\n" in fragments[1]:
+                    continue
+                id = obj["id"]
+                connection.execute(
+                    "INSERT OR REPLACE INTO fragments VALUES (?,?,?,?,?,?)",
+                    (id["authority"], id["code"], format, kind,
+                     fragments[0], fragments[1]))
+    connection.commit()
+    connection.close()
+
+
+# Quoted string, keyword, value, closing bracket or separator
+_WKT_TOKEN_RE = re.compile(
+    r'\s*(?:"((?:[^"]|"")*)"|([^\s,\[\]()"]+)\s*[\[(]|([^\s,\[\]()"]+)|([\])])|,)')
+
+
+def _wkt_tokens(wkt):
+    """ Yield the (kind, text) tokens of a WKT string, ignoring layout """
+
+    pos = 0
+    end = len(wkt.rstrip())
+    while pos < end:
+        m = _WKT_TOKEN_RE.match(wkt, pos)
+        if m is None or m.end() == pos:
+            raise Exception("Invalid WKT at offset %d" % pos)
+        pos = m.end()
+        quoted, keyword, value, closing = m.groups()
+        if quoted is not None:
+            yield b"s", quoted.replace("\"\"", "\"")
+        elif keyword is not None:
+            yield b"[", keyword
+        elif value is not None:
+            yield b"v", value
+        elif closing is not None:
+            yield b"]", ""
+
+
+class PROJJSONToWKTDigest(PROJJSONToWKT):
+    """ Variant of PROJJSONToWKT that computes a hash of the sequence of
+        emitted tokens (node names, strings and values) without building
+        the WKT string. It is insensitive to indentation and single_line,
+        and equal to wkt_digest() of the WKT string. """
+
+    def __init__(self, options=Options(), algorithm="sha256"):
+        PROJJSONToWKT.__init__(self, options)
+        self.hash = hashlib.new(algorithm)
+
+    def add_token(self, kind, s):
+        data = s.encode("utf-8")
+        self.hash.update(b"%s%d:%s" % (kind, len(data), data))
+
+    def start_node(self, name):
+        if self.options.has_limits:
+            self.node_count += 1
+            self.check_node_limits()
+        self.add_token(b"[", name)
+        self.stack_has_values.append(False)
+        self.node_depth += 1
+
+    def end_node(self):
+        self.add_token(b"]", "")
+        self.stack_has_values.pop()
+        self.node_depth -= 1
+
+    def start_pseudo_node(self):
+        self.stack_has_values.append(True)
+
+    def end_pseudo_node(self):
+        self.stack_has_values.pop()
+
+    def add_quoted_string(self, s):
+        if self.options.has_limits:
+            self.check_string_length(s)
+        self.add_token(b"s", s)
+
+    def add(self, s):
+        if self.options.has_limits:
+            self.check_string_length(s)
+        self.add_token(b"v", s)
+
+    def write_fragment(self, fragment):
+        for kind, s in _wkt_tokens(fragment):
+            self.add_token(kind, s)
+
+    def digest(self, projjson):
+        """ Return the hexadecimal digest of the WKT of a PROJJSON
+            dictionary """
+
+        self.crs_to_wkt(projjson)
+        return self.hash.hexdigest()
+
+
+def to_wkt_digest(projjson, options=Options(), algorithm="sha256"):
+    """ Return the hexadecimal digest of the tokens of the WKT of a PROJJSON
+        dictionary, without building the WKT string """
+    return PROJJSONToWKTDigest(options, algorithm).digest(projjson)
+
+
+def wkt_digest(wkt, algorithm="sha256"):
+    """ Return the hexadecimal digest of the tokens of a WKT string, as
+        computed by to_wkt_digest() """
+
+    writer = PROJJSONToWKTDigest(algorithm=algorithm)
+    writer.write_fragment(wkt)
+    return writer.hash.hexdigest()
+
+
+def _object_paths(obj, path=(), paths=None):
+    """ Return a dictionary mapping id() of each dictionary of a PROJJSON
+        tree to its path (tuple of keys and list indices) """
+
+    if paths is None:
+        paths = {}
+    if isinstance(obj, dict):
+        # An object reachable through several paths cannot be patched
+        # in isolation
+        paths[id(obj)] = None if id(obj) in paths else path
+        for k, v in obj.items():
+            _object_paths(v, path + (k,), paths)
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            _object_paths(v, path + (i,), paths)
+    return paths
+
+
+def _dict_ids(obj):
+    """ Yield id() of each dictionary of a PROJJSON tree """
+
+    if isinstance(obj, dict):
+        yield id(obj)
+        for v in obj.values():
+            yield from _dict_ids(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _dict_ids(v)
+
+
+def _get_path(obj, path):
+    for k in path:
+        obj = obj[k]
+    return obj
+
+
+class _SpanRecordingPROJJSONToWKT(PROJJSONToWKT):
+    """ Records the output span of each PARAMETER node and of each
+        USAGE/ID/REMARK block, keyed by (method name, PROJJSON path).
+        The USAGE nodes of the items of "usages" belong to the span of the
+        object owning the "usages" array. """
+
+    def __init__(self, options, paths):
+        PROJJSONToWKT.__init__(self, options)
+        self.paths = paths
+        self.spans = {}
+        self.in_object_usage = False
+
+    def record(self, method, obj):
+        start = self.size
+        depth = len(self.stack_has_values)
+        has_values = self.stack_has_values[-1]
+        indentation = self.indentation
+        node_depth = self.node_depth
+        node_count = self.node_count
+        getattr(PROJJSONToWKT, method)(self, obj)
+        path = self.paths.get(id(obj), None)
+        if path is None:
+            return
+        # A span rendering a dictionary reachable through several paths
+        # cannot be patched in isolation
+        rendered = obj if method == "parameter_to_wkt" else \
+            [obj.get(k, None) for k in IncrementalWKT.USAGE_KEYS]
+        if any(self.paths.get(i, None) is None for i in _dict_ids(rendered)):
+            return
+        self.spans[(method, path)] = [
+            start, self.size, depth, has_values, indentation, node_depth,
+            self.node_count - node_count]
+
+    def parameter_to_wkt(self, parameter):
+        self.record("parameter_to_wkt", parameter)
+
+    def object_usage_to_wkt(self, obj):
+        if self.in_object_usage:
+            PROJJSONToWKT.object_usage_to_wkt(self, obj)
+            return
+        self.in_object_usage = True
+        try:
+            self.record("object_usage_to_wkt", obj)
+        finally:
+            self.in_object_usage = False
+
+
+class IncrementalWKT:
+    """ WKT rendering of a PROJJSON dictionary that can be cheaply updated
+        when only leaf fields change.
+
+        Changes affecting a parameter, or the scope, area, bbox, usages,
+        id, ids or remarks of an object, only re-render the corresponding
+        PARAMETER node or USAGE/ID/REMARK block. Other changes cause a full
+        re-rendering.
+    """
+
+    # Keys of an object whose rendering is done by object_usage_to_wkt()
+    USAGE_KEYS = ("scope", "area", "bbox", "usages", "id", "ids", "remarks")
+
+    def __init__(self, projjson, options=Options()):
+        self.projjson = projjson
+        self.options = options
+        self.render()
+
+    def render(self):
+        """ Fully (re-)render the PROJJSON dictionary """
+
+        paths = _object_paths(self.projjson)
+        writer = _SpanRecordingPROJJSONToWKT(self.options, paths)
+        self.wkt = writer.to_wkt(self.projjson)
+        self.spans = writer.spans
+        self.paths = paths
+        self.node_count = writer.node_count
+        return self.wkt
+
+    def find_span(self, path):
+        """ Return the key of the innermost span whose rendering depends on
+            the value at path, or None """
+
+        for k in range(len(path), -1, -1):
+            prefix = path[0:k]
+            if k < len(path) and path[k] in self.USAGE_KEYS and \
+                    ("object_usage_to_wkt", prefix) in self.spans:
+                return ("object_usage_to_wkt", prefix)
+            if ("parameter_to_wkt", prefix) in self.spans:
+                return ("parameter_to_wkt", prefix)
+        return None
+
+    def patch(self, key):
+        """ Re-render the span of the given key """
+
+        method, path = key
+        start, end, depth, has_values, indentation, node_depth, \
+            node_count = self.spans[key]
+        obj = _get_path(self.projjson, path)
+        paths = _object_paths(obj, path)
+        writer = _SpanRecordingPROJJSONToWKT(self.options, paths)
+        writer.stack_has_values = [True] * (depth - 1) + [has_values]
+        writer.indentation = indentation
+        writer.node_depth = node_depth
+        # Start from the totals of the rest of the document, so that the
+        # limits apply to the whole document
+        writer.size = len(self.wkt) - (end - start)
+        writer.node_count = self.node_count - node_count
+        offset = start - writer.size
+        getattr(writer, method)(obj)
+        if self.options.has_limits:
+            writer.check_output_size()
+        delta = len(writer.wkt) - (end - start)
+        delta_node_count = writer.node_count - self.node_count
+        self.node_count = writer.node_count
+        self.paths.update(paths)
+
+        self.wkt = self.wkt[0:start] + writer.wkt + self.wkt[end:]
+        for other_key in list(self.spans.keys()):
+            if other_key == key:
+                continue
+            span = self.spans[other_key]
+            other_path = other_key[1]
+            contained = span[0] >= start and span[1] <= end
+            containing = span[0] <= start and span[1] >= end
+            if contained and other_path[0:len(path)] == path and \
+                    (len(other_path) > len(path) or span[2] > depth):
+                # Nested in the re-rendered span: replaced below
+                del self.spans[other_key]
+            elif span[0] >= end:
+                span[0] += delta
+                span[1] += delta
+            elif containing and path[0:len(other_path)] == other_path:
+                # Enclosing the re-rendered span
+                span[1] += delta
+                span[6] += delta_node_count
+        for new_key, span in writer.spans.items():
+            span[0] += offset
+            span[1] += offset
+            self.spans[new_key] = span
+        return writer.spans.keys()
+
+    def update(self, changes):
+        """ Apply changes, an iterable of (path, value) tuples where path is
+            a tuple of keys and list indices into the PROJJSON dictionary,
+            and return the updated WKT string. If the rendering fails, for
+            example with LimitExceededException, the changes are rolled
+            back. """
+
+        keys = []
+        full_render = False
+        # (container, key, whether the key existed, previous value) of the
+        # applied changes, to roll them back on error
+        applied = []
+        patching = False
+        try:
+            for path, value in changes:
+                path = tuple(path)
+                if not path:
+                    raise Exception("Empty path")
+                container = _get_path(self.projjson, path[0:-1])
+                k = path[-1]
+                existed = isinstance(container, list) or k in container
+                previous = container[k] if existed else None
+                container[k] = value
+                applied.append((container, k, existed, previous))
+                key = self.find_span(path)
+                # A value whose dictionaries are also elsewhere in the tree
+                # creates aliases
+                if key is None or any(i in self.paths
+                                      for i in _dict_ids(value)):
+                    full_render = True
+                elif key not in keys:
+                    keys.append(key)
+
+            if full_render:
+                return self.render()
+
+            patching = True
+            refreshed = set()
+            for key in keys:
+                if key not in refreshed:
+                    refreshed.update(self.patch(key))
+            return self.wkt
+        except Exception:
+            for container, k, existed, previous in reversed(applied):
+                if existed:
+                    container[k] = previous
+                else:
+                    del container[k]
+            if patching:
+                # Restore the spans of the previous state
+                self.render()
+            raise
+
+
+class _NodeRecordingPROJJSONToWKT(PROJJSONToWKT):
+    """ Records the (start, end, indentation) output span of each node, in
+        the order nodes are ended """
+
+    def __init__(self, options):
+        PROJJSONToWKT.__init__(self, options)
+        self.node_starts = []
+        self.nodes = []
+
+    def start_node(self, name):
+        indentation = self.indentation
+        PROJJSONToWKT.start_node(self, name)
+        self.node_starts.append((self.size - len(name) - 1, indentation))
+
+    def end_node(self):
+        PROJJSONToWKT.end_node(self)
+        start, indentation = self.node_starts.pop()
+        self.nodes.append((start, self.size, indentation))
+
+
+def _reference_indentation(s):
+    """ Return the indentation ending s, the text preceding a reference to
+        a fragment, by which the fragment must be re-indented """
+
+    pos = s.rfind("\n")
+    if pos < 0 or s[pos + 1:].strip(" "):
+        return ""
+    return s[pos + 1:]
+
+
+def _expand_parts(parts, expanded):
+    """ Return the text of parts, where fragment references are replaced by
+        the re-indented expanded fragments """
+
+    pieces = []
+    for x in parts:
+        if isinstance(x, int):
+            indentation = _reference_indentation(pieces[-1]) if pieces else ""
+            x = expanded[x]
+            if indentation:
+                x = x.replace("\n", "\n" + indentation)
+        pieces.append(x)
+    return "".join(pieces)
+
+
+class BulkExporter:
+    """ Export of many PROJJSON dictionaries into an archive where
+        repeated nodes (ensembles, ellipsoids, units, ...) are stored once.
+
+        The archive is a JSON serializable dictionary with a "fragments"
+        and a "records" list. Each fragment and each record is a list whose
+        items are either strings, or integers referencing a fragment.
+        Fragments are rendered at indentation level 0, and re-indented by
+        the indentation preceding their reference, so that the same node
+        at different depths is stored once. Only nodes referenced at least
+        twice are stored as fragments.
+    """
+
+    def __init__(self, options=Options(), min_fragment_size=32):
+        self.options = options
+        self.min_fragment_size = min_fragment_size
+        self.fragments = []
+        self.fragment_index = {}
+        self.records = []
+
+    def parts(self, wkt, start, end, children, indentation):
+        """ Return the parts of wkt[start:end] rendered at indentation level
+            0, where the interned children (list of (start, end, fragment
+            index)) are replaced by their fragment index """
+
+        parts = []
+        pos = start
+        for child_start, child_end, idx in children:
+            if child_start > pos:
+                parts.append(wkt[pos:child_start])
+            parts.append(idx)
+            pos = child_end
+        if end > pos:
+            parts.append(wkt[pos:end])
+        if indentation:
+            parts = [x.replace("\n" + indentation, "\n")
+                     if isinstance(x, str) else x for x in parts]
+        return parts
+
+    def add(self, projjson):
+        """ Add a PROJJSON dictionary and return its record index """
+
+        writer = _NodeRecordingPROJJSONToWKT(self.options)
+        wkt = writer.to_wkt(projjson)
+
+        # Interned nodes not yet included in an interned ancestor
+        interned = []
+        for start, end, indentation in writer.nodes:
+            text = wkt[start:end]
+            if indentation:
+                text = text.replace("\n" + indentation, "\n")
+                # Nodes with new lines in strings cannot be re-indented
+                if text.replace("\n", "\n" + indentation) != wkt[start:end]:
+                    continue
+            if len(text) < self.min_fragment_size:
+                continue
+            # Nodes are ended children first, so the interned children of
+            # this node are at the end of the list
+            first_child = len(interned)
+            while first_child > 0 and interned[first_child - 1][0] >= start:
+                first_child -= 1
+            idx = self.fragment_index.get(text, None)
+            if idx is None:
+                idx = len(self.fragments)
+                self.fragments.append(self.parts(
+                    wkt, start, end, interned[first_child:], indentation))
+                self.fragment_index[text] = idx
+            del interned[first_child:]
+            interned.append((start, end, idx))
+
+        self.records.append(self.parts(wkt, 0, len(wkt), interned, ""))
+        return len(self.records) - 1
+
+    def archive(self):
+        """ Return the archive as a dictionary, where the fragments
+            referenced once are inlined into their referencing part """
+
+        reference_counts = [0] * len(self.fragments)
+        for parts in self.fragments + self.records:
+            for x in parts:
+                if isinstance(x, int):
+                    reference_counts[x] += 1
+
+        # For each fragment, its index in the archive if it is kept, or
+        # its parts to inline. Fragments only reference fragments with a
+        # lower index.
+        resolved = []
+        fragments = []
+        for parts, count in zip(self.fragments, reference_counts):
+            parts = self.inline(parts, resolved)
+            if count > 1:
+                resolved.append(len(fragments))
+                fragments.append(parts)
+            else:
+                resolved.append(parts)
+        records = [self.inline(parts, resolved) for parts in self.records]
+        return {"fragments": fragments, "records": records}
+
+    def inline(self, parts, resolved):
+        """ Return parts where references are replaced by their resolved
+            fragment index, or by their re-indented resolved parts """
+
+        result = []
+        for x in parts:
+            if isinstance(x, int):
+                if isinstance(resolved[x], int):
+                    result.append(resolved[x])
+                    continue
+                indentation = _reference_indentation(result[-1]) \
+                    if result else ""
+                inlined = [y.replace("\n", "\n" + indentation)
+                           if indentation and isinstance(y, str) else y
+                           for y in resolved[x]]
+            else:
+                inlined = [x]
+            for y in inlined:
+                if isinstance(y, str) and result and \
+                        isinstance(result[-1], str):
+                    result[-1] += y
+                else:
+                    result.append(y)
+        return result
+
+
+def bulk_export(projjsons, options=Options(), min_fragment_size=32):
+    """ Convert an iterable of PROJJSON dictionaries into an archive with
+        interned fragments. See BulkExporter """
+
+    exporter = BulkExporter(options, min_fragment_size)
+    for projjson in projjsons:
+        exporter.add(projjson)
+    return exporter.archive()
+
+
+def expand_bulk_export(archive):
+    """ Return the list of WKT strings of an archive created by
+        bulk_export() """
+
+    # Fragments only reference fragments with a lower index
+    expanded = []
+    for parts in archive["fragments"]:
+        expanded.append(_expand_parts(parts, expanded))
+    return [_expand_parts(parts, expanded) for parts in archive["records"]]
 
 
 if __name__ == "__main__":
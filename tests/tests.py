@@ -2,8 +2,22 @@
 # SPDX-License-Identifier: MIT
 # Copyright 2022, Even Rouault
 
+import concurrent.futures
+import copy
+import json
+import lzma
+import os
+import pickle
 import pytest
-from projjson_to_wkt import to_wkt, Options, WKT1
+import sqlite3
+import subprocess
+import sys
+import zlib
+from projjson_to_wkt import to_wkt, to_wkt_bytes, Options, WKT1, WKT2_2019, LimitExceededException
+from projjson_to_wkt import IncrementalWKT, bulk_export, expand_bulk_export
+from projjson_to_wkt import WKTRegistry, create_wkt_registry
+from projjson_to_wkt import to_wkt_digest, wkt_digest, to_wkt_lazy
+from projjson_to_wkt import PROJJSONToWKTBytes
 
 
 def test_geog_crs_epsg_4326():
@@ -325,3 +339,422 @@ def test_dynamic_vertical_crs_epsg_5613():
     UNIT["metre",1],
     AXIS["Gravity-related height (H)",UP],
     AUTHORITY["EPSG","5613"]]"""
+
+
+def test_incremental_wkt():
+
+    j = {"type": "ProjectedCRS", "name": "WGS 84 / UTM zone 31N", "base_crs": {"name": "WGS 84", "datum": {"type": "GeodeticReferenceFrame", "name": "World Geodetic System 1984", "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}}, "coordinate_system": {"subtype": "ellipsoidal", "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"}, {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"}]}}, "conversion": {"name": "UTM zone 31N", "method": {"name": "Transverse Mercator"}, "parameters": [
+        {"name": "Longitude of natural origin", "value": 3, "unit": "degree", "id": {"authority": "EPSG", "code": 8802}}, {"name": "False easting", "value": 500000, "unit": "metre"}]}, "coordinate_system": {"subtype": "Cartesian", "axis": [{"name": "Easting", "abbreviation": "E", "direction": "east", "unit": "metre"}, {"name": "Northing", "abbreviation": "N", "direction": "north", "unit": "metre"}]}, "id": {"authority": "EPSG", "code": 32631}}
+
+    inc = IncrementalWKT(j)
+    assert inc.wkt == to_wkt(j)
+
+    wkt = inc.update([(("conversion", "parameters", 0, "value"), 9),
+                      (("scope",), "Engineering survey."),
+                      (("area",), "World.")])
+    assert wkt == """PROJCRS["WGS 84 / UTM zone 31N",
+    BASEGEOGCRS["WGS 84",
+        DATUM["World Geodetic System 1984",
+            ELLIPSOID["WGS 84",6378137,298.257223563,
+                LENGTHUNIT["metre",1]]]],
+    CONVERSION["UTM zone 31N",
+        METHOD["Transverse Mercator"],
+        PARAMETER["Longitude of natural origin",9,
+            ANGLEUNIT["degree",0.0174532925199433],
+            ID["EPSG",8802]],
+        PARAMETER["False easting",500000,
+            LENGTHUNIT["metre",1]]],
+    CS[Cartesian,2],
+        AXIS["easting (E)",east,
+            LENGTHUNIT["metre",1]],
+        AXIS["northing (N)",north,
+            LENGTHUNIT["metre",1]],
+    USAGE[
+        SCOPE["Engineering survey."],
+        AREA["World."]],
+    ID["EPSG",32631]]"""
+    assert wkt == to_wkt(j)
+
+    inc.update([(("conversion", "parameters", 0, "id"), None),
+                (("conversion", "parameters", 1, "unit"),
+                 {"type": "LinearUnit", "name": "US survey foot", "conversion_factor": 0.304800609601219}),
+                (("conversion", "remarks"), "Edited"),
+                (("scope",), None),
+                (("area",), None)])
+    assert inc.wkt == to_wkt(j)
+
+    # Not a leaf handled incrementally: full re-rendering
+    inc.update([(("name",), "Renamed")])
+    assert inc.wkt == to_wkt(j)
+
+    inc = IncrementalWKT(j, Options(format=WKT1))
+    inc.update([(("conversion", "parameters", 1, "value"), 400000)])
+    assert inc.wkt == to_wkt(j, Options(format=WKT1))
+
+    vert = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid"}, "coordinate_system": {"subtype": "vertical", "axis": [
+        {"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}, "usages": [{"scope": "a", "area": "b"}, {"scope": "c"}], "id": {"authority": "EPSG", "code": 5773}}
+    for updates in ([[(("usages", 0, "area"), None)], [(("id",), None)]],
+                    [[(("usages", 1, "scope"), "zz"), (("remarks",), "r")]],
+                    [[(("usages", 0, "scope"), "x"),
+                      (("usages",), [{"scope": "q"}])]],
+                    [[(("usages", 1, "id"), {"authority": "A", "code": 1})],
+                     [(("remarks",), "r")],
+                     [(("id", "code"), 2)]]):
+        inc = IncrementalWKT(copy.deepcopy(vert))
+        for changes in updates:
+            inc.update(changes)
+            assert inc.wkt == to_wkt(inc.projjson)
+
+    # Dictionaries reachable through several paths
+    foot = {"type": "LinearUnit", "name": "US survey foot", "conversion_factor": 0.304800609601219}
+    shared = copy.deepcopy(j)
+    shared["conversion"]["parameters"][0]["unit"] = foot
+    shared["conversion"]["parameters"][1]["unit"] = foot
+    inc = IncrementalWKT(shared)
+    inc.update([(("conversion", "parameters", 1, "unit", "name"), "foot")])
+    assert inc.wkt == to_wkt(shared)
+    distinct = copy.deepcopy(j)
+    distinct["conversion"]["parameters"][0]["unit"] = dict(foot)
+    distinct["conversion"]["parameters"][1]["unit"] = dict(foot)
+    inc = IncrementalWKT(distinct)
+    inc.update([(("conversion", "parameters", 1, "unit"),
+                 distinct["conversion"]["parameters"][0]["unit"])])
+    inc.update([(("conversion", "parameters", 0, "unit", "name"), "ft")])
+    assert inc.wkt == to_wkt(distinct)
+
+    # Limits apply to the whole document, and rejected changes are rolled
+    # back
+    for projjson, options, changes in (
+            (vert, Options(max_output_size=len(to_wkt(vert)) + 20), [(("remarks",), "x" * 150)]),
+            (vert, Options(max_node_count=11), [(("usages", 0, "area"), "e"), (("usages", 1, "area"), "d")]),
+            (j, Options(max_string_length=30), [(("conversion", "parameters", 1, "value"), 1), (("scope",), "x" * 31)])):
+        wkt = to_wkt(projjson)
+        inc = IncrementalWKT(copy.deepcopy(projjson), options)
+        with pytest.raises(LimitExceededException):
+            inc.update(changes)
+        assert inc.projjson == projjson
+        assert inc.wkt == wkt
+        inc.update([(changes[0][0], "z")])
+        assert inc.wkt == to_wkt(inc.projjson)
+
+
+def test_bulk_export():
+
+    geog = {"type": "GeographicCRS", "name": "WGS 84", "datum": {"type": "GeodeticReferenceFrame", "name": "World Geodetic System 1984", "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}}, "coordinate_system": {
+        "subtype": "ellipsoidal", "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"}, {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"}]}, "id": {"authority": "EPSG", "code": 4326}}
+    vert = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid"}, "coordinate_system": {
+        "subtype": "vertical", "axis": [{"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}}
+    compound = {"type": "CompoundCRS",
+                "name": "WGS 84 + EGM96 height", "components": [geog, vert]}
+    projjsons = [geog, vert, compound]
+
+    for options in (Options(), Options(single_line=True), Options(format=WKT1)):
+        archive = bulk_export(projjsons, options)
+        assert expand_bulk_export(archive) == [
+            to_wkt(j, options) for j in projjsons]
+
+    archive = bulk_export(projjsons, Options(single_line=True))
+    # The ANGLEUNIT node is shared by both axes
+    assert archive["fragments"][0] == ['ANGLEUNIT["degree",0.0174532925199433]']
+    # The geographic CRS is stored once and referenced from the compound CRS
+    geog_fragment = archive["records"][0][0]
+    assert archive["records"][0] == [geog_fragment]
+    assert archive["fragments"][geog_fragment][0].startswith('GEOGCRS["WGS 84",DATUM[')
+    assert archive["records"][2][0:2] == [
+        'COMPOUNDCRS["WGS 84 + EGM96 height",', geog_fragment]
+    # Nodes referenced once, such as ELLIPSOID, are inlined
+    assert len(archive["fragments"]) == 3
+
+    # The DATUM node is stored once at indentation level 0, although it is
+    # nested at different depths in GEOGCRS and BASEGEOGCRS
+    projected = {"type": "ProjectedCRS", "name": "WGS 84 / UTM zone 31N", "base_crs": {"name": "WGS 84", "datum": geog["datum"], "coordinate_system": geog["coordinate_system"]}, "conversion": {
+        "name": "UTM zone 31N", "method": {"name": "Transverse Mercator"}, "parameters": [{"name": "False easting", "value": 500000, "unit": "metre"}]}, "coordinate_system": {"subtype": "Cartesian", "axis": [{"name": "Easting", "abbreviation": "E", "direction": "east", "unit": "metre"}]}}
+    archive = bulk_export([geog, projected])
+    assert expand_bulk_export(archive) == [to_wkt(geog), to_wkt(projected)]
+    datum = to_wkt(geog).split("\n    ", 1)[1].split(",\n    CS[")[0]
+    assert archive["fragments"].count([datum.replace("\n    ", "\n")]) == 1
+    references = [x for parts in archive["fragments"] + archive["records"]
+                  for x in parts if isinstance(x, int)]
+    assert all(references.count(idx) > 1
+               for idx in range(len(archive["fragments"])))
+
+    # Nodes with new lines in strings are kept inline
+    multiline = copy.deepcopy(geog)
+    multiline["datum"]["name"] = "World\n    Geodetic System 1984"
+    assert expand_bulk_export(bulk_export([multiline, geog, multiline])) == [
+        to_wkt(multiline), to_wkt(geog), to_wkt(multiline)]
+
+
+def test_limits():
+
+    j = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid"}, "coordinate_system": {"subtype": "vertical", "axis": [
+        {"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}, "remarks": "x" * 1000, "id": {"authority": "EPSG", "code": 5773}}
+
+    wkt = to_wkt(j)
+    # VERTCRS[...,AXIS[...,LENGTHUNIT[...]]]: the pseudo node wrapping the
+    # CS[] and AXIS[] nodes does not count as a level
+    assert to_wkt(j, Options(max_output_size=len(wkt), max_depth=3,
+                             max_node_count=7, max_string_length=1000)) == wkt
+    assert to_wkt(j, Options(format=WKT1, max_depth=2)) == to_wkt(j, Options(format=WKT1))
+
+    with pytest.raises(LimitExceededException):
+        to_wkt(j, Options(max_output_size=len(wkt) - 1))
+    with pytest.raises(LimitExceededException):
+        to_wkt(j, Options(max_output_size=100))
+    with pytest.raises(LimitExceededException):
+        to_wkt(j, Options(max_depth=2))
+    with pytest.raises(LimitExceededException):
+        to_wkt(j, Options(max_node_count=6))
+    with pytest.raises(LimitExceededException):
+        to_wkt(j, Options(max_string_length=999))
+
+
+def test_to_wkt_bytes():
+
+    j = {"type": "VerticalCRS", "name": "RH2000 höjd", "datum": {"type": "VerticalReferenceFrame", "name": "Rikets höjdsystem 2000"}, "coordinate_system": {"subtype": "vertical", "axis": [
+        {"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}, "area": "Sweden - onshore. " * 5000}
+
+    wkt = to_wkt(j)
+    assert to_wkt_bytes(j) == wkt.encode("utf-8")
+    options = Options(single_line=True)
+    assert to_wkt_bytes(j, options) == to_wkt(j, options).encode("utf-8")
+    assert PROJJSONToWKTBytes().to_wkt(j) == wkt
+    writer = PROJJSONToWKTBytes(options)
+    writer.to_wkt_bytes(j)
+    assert writer.wkt == to_wkt(j, options)
+    with pytest.raises(Exception):
+        PROJJSONToWKTBytes(compressor=zlib.compressobj()).to_wkt(j)
+
+    compressed = to_wkt_bytes(j, compressor=zlib.compressobj())
+    assert len(compressed) < len(wkt) / 10
+    assert zlib.decompress(compressed) == wkt.encode("utf-8")
+    assert lzma.decompress(to_wkt_bytes(
+        j, compressor=lzma.LZMACompressor())) == wkt.encode("utf-8")
+
+    size = len(wkt.encode("utf-8"))
+    assert to_wkt_bytes(j, Options(max_output_size=size)) == wkt.encode("utf-8")
+    with pytest.raises(LimitExceededException):
+        to_wkt_bytes(j, Options(max_output_size=size - 1),
+                     compressor=zlib.compressobj())
+    with pytest.raises(LimitExceededException):
+        to_wkt_bytes(j, Options(max_output_size=size - 1))
+
+    # The output is compressed by chunks
+    writer = PROJJSONToWKTBytes(compressor=zlib.compressobj())
+    writer.CHUNK_SIZE = 1000
+    assert zlib.decompress(writer.to_wkt_bytes(j)) == wkt.encode("utf-8")
+    assert len(writer.compressed_chunks) > 2
+
+
+def test_parallel_rendering():
+
+    geog = {"type": "GeographicCRS", "name": "WGS 84", "datum": {"type": "GeodeticReferenceFrame", "name": "World Geodetic System 1984", "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}}, "coordinate_system": {
+        "subtype": "ellipsoidal", "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"}, {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"}]}, "id": {"authority": "EPSG", "code": 4326}}
+    vert = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid"}, "coordinate_system": {
+        "subtype": "vertical", "axis": [{"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}}
+    compound = {"type": "CompoundCRS",
+                "name": "WGS 84 + EGM96 height", "components": [geog, vert], "scope": "Spatial referencing."}
+    bound = {"type": "BoundCRS", "source_crs": compound, "target_crs": geog, "transformation": {"name": "Transformation to WGS 84", "method": {"name": "Geocentric translations (geog2D domain)"}, "parameters": [
+        {"name": "X-axis translation", "value": 1, "unit": "metre"}, {"name": "Y-axis translation", "value": 2, "unit": "metre"}, {"name": "Z-axis translation", "value": 3, "unit": "metre"}]}}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        for options in (Options(), Options(single_line=True), Options(format=WKT1)):
+            assert to_wkt(compound, options, executor=executor) == to_wkt(
+                compound, options)
+        assert to_wkt(bound, executor=executor) == to_wkt(bound)
+
+        options = Options(max_node_count=len(to_wkt(bound).split("[")) - 1)
+        assert to_wkt(bound, options, executor=executor) == to_wkt(bound)
+        options = Options(max_node_count=len(to_wkt(bound).split("[")) - 2)
+        with pytest.raises(LimitExceededException):
+            to_wkt(bound, options, executor=executor)
+
+
+def test_wkt_registry(tmp_path):
+
+    geog = {"type": "GeographicCRS", "name": "WGS 84", "datum_ensemble": {"name": "World Geodetic System 1984 ensemble", "members": [{"name": "World Geodetic System 1984 (Transit)", "id": {"authority": "EPSG", "code": 1166}}, {"name": "World Geodetic System 1984 (G730)", "id": {"authority": "EPSG", "code": 1152}}], "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}, "accuracy": "2.0", "id": {"authority": "EPSG", "code": 6326}}, "coordinate_system": {
+        "subtype": "ellipsoidal", "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"}, {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"}]}, "scope": "Horizontal component of 3D system.", "area": "World.", "bbox": {"south_latitude": -90, "west_longitude": -180, "north_latitude": 90, "east_longitude": 180}, "id": {"authority": "EPSG", "code": 4326}}
+    vert = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid", "id": {"authority": "EPSG", "code": 5171}}, "coordinate_system": {
+        "subtype": "vertical", "axis": [{"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}}
+    compound = {"type": "CompoundCRS",
+                "name": "WGS 84 + EGM96 height", "components": [geog, vert]}
+
+    path = str(tmp_path / "registry.db")
+    create_wkt_registry(path, [geog, vert])
+
+    thin_geog = {"type": "GeographicCRS",
+                 "id": {"authority": "EPSG", "code": 4326}}
+    thin_vert = dict(vert)
+    thin_vert["datum"] = {"type": "VerticalReferenceFrame",
+                          "id": {"authority": "EPSG", "code": 5171}}
+    thin_compound = {"type": "CompoundCRS",
+                     "name": "WGS 84 + EGM96 height", "components": [thin_geog, thin_vert]}
+    thin_projected = {"type": "ProjectedCRS", "name": "WGS 84 / UTM zone 31N", "base_crs": {"name": "WGS 84", "datum_ensemble": {"id": {"authority": "EPSG", "code": 6326}}, "coordinate_system": geog["coordinate_system"]}, "conversion": {
+        "name": "UTM zone 31N", "method": {"name": "Transverse Mercator"}, "parameters": [{"name": "False easting", "value": 500000, "unit": "metre"}]}, "coordinate_system": {"subtype": "Cartesian", "axis": [{"name": "Easting", "abbreviation": "E", "direction": "east", "unit": "metre"}]}}
+    projected = dict(thin_projected)
+    projected["base_crs"] = dict(thin_projected["base_crs"])
+    projected["base_crs"]["datum_ensemble"] = geog["datum_ensemble"]
+
+    registry = WKTRegistry(path)
+    for format in (WKT2_2019, WKT1):
+        for single_line in (False, True):
+            options = Options(format=format, single_line=single_line)
+            registry_options = Options(format=format, single_line=single_line,
+                                       registry=registry)
+            assert to_wkt(thin_compound, registry_options) == to_wkt(
+                compound, options)
+            assert to_wkt(thin_projected, registry_options) == to_wkt(
+                projected, options)
+
+    # Objects which are not reduced to their id are rendered from their
+    # content
+    custom = dict(geog, name="Custom")
+    assert to_wkt(custom, Options(registry=registry)) == to_wkt(custom)
+    assert to_wkt(compound, Options(registry=registry)) == to_wkt(compound)
+    # String codes do not match integer codes
+    assert registry.lookup("EPSG", "4326", WKT2_2019, "crs", False) is None
+    string_code = {"type": "GeographicCRS", "id": {"authority": "EPSG", "code": "4326"}}
+    with pytest.raises(Exception):
+        to_wkt(string_code, Options(registry=registry))
+    create_wkt_registry(path, [dict(geog, id={"authority": "EPSG", "code": "4326"})])
+    registry = WKTRegistry(path)
+    assert to_wkt(string_code, Options(registry=registry)) == \
+        to_wkt(geog).replace('ID["EPSG",4326]', 'ID["EPSG","4326"]')
+    assert to_wkt(thin_geog, Options(registry=registry)) == to_wkt(geog)
+
+    # Registries can be sent to worker processes
+    assert pickle.loads(pickle.dumps(registry)).lookup(
+        "EPSG", 4326, WKT1, "crs", True) == to_wkt(geog, Options(format=WKT1, single_line=True))
+    assert registry.lookup("EPSG", 1, WKT1, "crs", True) is None
+
+    # Rows are keyed on stable kinds, not on PROJJSONToWKT method names
+    connection = sqlite3.connect(path)
+    assert sorted(row[0] for row in connection.execute(
+        "SELECT DISTINCT kind FROM fragments")) == ["crs", "ensemble", "vertical_datum"]
+    connection.close()
+
+    # The connection is opened once when the first lookups are concurrent
+    registry = WKTRegistry(path)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        fragments = list(executor.map(lambda code: registry.lookup(
+            "EPSG", code, WKT2_2019, "crs", False), [4326] * 32))
+    assert fragments == [to_wkt(geog)] * 32
+
+
+def test_wkt_digest():
+
+    j = {"type": "VerticalCRS", "name": "RH2000 \"height\"", "datum": {"type": "DynamicVerticalReferenceFrame", "name": "Rikets hojdsystem 2000", "frame_reference_epoch": 2000}, "coordinate_system": {"subtype": "vertical", "axis": [
+        {"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}, "scope": "Geodesy, engineering survey.", "area": "Sweden - onshore.", "bbox": {"south_latitude": 55.28, "west_longitude": 10.93, "north_latitude": 69.07, "east_longitude": 24.17}, "id": {"authority": "EPSG", "code": 5613}}
+
+    digest = to_wkt_digest(j)
+    assert digest == wkt_digest(to_wkt(j))
+    assert digest == wkt_digest(to_wkt(j, Options(single_line=True)))
+    assert digest == wkt_digest(to_wkt(j).replace("\n", "\r\n  "))
+    assert to_wkt_digest(j, Options(format=WKT1)) == wkt_digest(
+        to_wkt(j, Options(format=WKT1)))
+    assert to_wkt_digest(j, algorithm="md5") == wkt_digest(
+        to_wkt(j), algorithm="md5")
+
+    assert digest != wkt_digest(to_wkt(j).replace("2000", "2001"))
+    assert digest != wkt_digest(to_wkt(j).replace("USAGE[", "USAGE[\"\","))
+    assert digest != wkt_digest(to_wkt(j).replace("(H)", "(h)"))
+    assert digest != to_wkt_digest(j, Options(format=WKT1))
+
+    with pytest.raises(Exception):
+        wkt_digest("VERTCRS[\"unterminated]")
+
+
+def test_quoted_strings():
+
+    j = {"type": "VerticalCRS", "name": "\"EGM96\" height", "datum": {"type": "VerticalReferenceFrame", "name": "\"EGM96\" height"}, "coordinate_system": {"subtype": "vertical", "axis": [
+        {"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}, "remarks": "\"\""}
+
+    wkt = to_wkt(j, Options(single_line=True))
+    assert wkt == 'VERTCRS["""EGM96"" height",VDATUM["""EGM96"" height"],CS[vertical,1],AXIS["gravity-related height (H)",up,LENGTHUNIT["metre",1]],REMARK[""""""]]'
+
+
+def test_lazy_wkt():
+
+    geog = {"type": "GeographicCRS", "name": "WGS 84", "datum": {"type": "GeodeticReferenceFrame", "name": "World Geodetic System 1984", "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}}, "coordinate_system": {
+        "subtype": "ellipsoidal", "axis": [{"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"}, {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"}]}, "id": {"authority": "EPSG", "code": 4326}}
+    vert = {"type": "VerticalCRS", "name": "EGM96 height", "datum": {"type": "VerticalReferenceFrame", "name": "EGM96 geoid"}, "coordinate_system": {
+        "subtype": "vertical", "axis": [{"name": "Gravity-related height", "abbreviation": "H", "direction": "up", "unit": "metre"}]}}
+    compound = {"type": "CompoundCRS",
+                "name": "WGS 84 + EGM96 height", "components": [geog, vert], "id": {"authority": "EPSG", "code": 9707}}
+    bound = {"type": "BoundCRS", "source_crs": compound, "target_crs": geog, "transformation": {"name": "Transformation to WGS 84", "method": {"name": "Geocentric translations (geog2D domain)"}, "parameters": [
+        {"name": "X-axis translation", "value": 1, "unit": "metre"}]}}
+
+    for options in (Options(), Options(single_line=True), Options(format=WKT1)):
+        lazy = to_wkt_lazy(compound, options)
+        assert lazy.name == "WGS 84 + EGM96 height"
+        assert lazy.id == {"authority": "EPSG", "code": 9707}
+        assert lazy.components[0].wkt == to_wkt(geog, options)
+        assert str(lazy.components[1]) == to_wkt(vert, options)
+        chunks = list(lazy)
+        assert len(chunks) == 4
+        assert "".join(chunks) == to_wkt(compound, options)
+        assert lazy.wkt == to_wkt(compound, options)
+
+    lazy = to_wkt_lazy(bound)
+    assert lazy.wkt == to_wkt(bound)
+    assert lazy.source_crs.components[1].wkt == to_wkt(vert)
+    assert lazy.target_crs.wkt == to_wkt(geog)
+
+    # Components are only rendered when accessed
+    broken = {"type": "CompoundCRS", "name": "broken",
+              "components": [geog, {"type": "unknown"}]}
+    lazy = to_wkt_lazy(broken)
+    assert next(iter(lazy)) == 'COMPOUNDCRS["broken"'
+    assert lazy.components[0].wkt == to_wkt(geog)
+    with pytest.raises(Exception):
+        lazy.components[1].wkt
+
+    # Child views are built once, and keep their rendered WKT
+    lazy = to_wkt_lazy(bound)
+    assert lazy.source_crs is lazy.source_crs
+    assert lazy.target_crs is lazy.target_crs
+    assert lazy.source_crs.components is lazy.source_crs.components
+    wkt = lazy.source_crs.components[0].wkt
+    assert lazy.source_crs.components[0].cached_wkt is wkt
+
+    # Limits apply to the whole output, across lazily rendered subtrees
+    compound = {"type": "CompoundCRS", "name": "5 x WGS 84",
+                "components": [geog] * 5}
+    options = Options(max_output_size=len(to_wkt(geog)) + 50,
+                      max_node_count=20)
+    with pytest.raises(LimitExceededException):
+        to_wkt(compound, options)
+    with pytest.raises(LimitExceededException):
+        to_wkt_lazy(compound, options).wkt
+    with pytest.raises(LimitExceededException):
+        to_wkt_lazy(compound, Options(max_node_count=20)).wkt
+    with pytest.raises(LimitExceededException):
+        to_wkt_lazy(compound, Options(max_output_size=len(to_wkt(compound)) - 1)).wkt
+    wkt = to_wkt(compound)
+    assert to_wkt_lazy(compound, Options(max_output_size=len(wkt))).wkt == wkt
+
+
+def test_generate_corpus():
+
+    benchmarks_dir = os.path.join(os.path.dirname(__file__), "..", "benchmarks")
+    sys.path.insert(0, benchmarks_dir)
+    try:
+        from corpus import generate_corpus
+    finally:
+        sys.path.remove(benchmarks_dir)
+
+    corpus = generate_corpus(200, seed=1)
+    assert len(corpus) == 200
+    assert generate_corpus(200, seed=1) == corpus
+    assert generate_corpus(200, seed=2) != corpus
+    for projjson in corpus:
+        to_wkt(projjson)
+
+    # The baseline of benchmarks/regression.py relies on the corpus being
+    # the same in other processes, whatever the hash seed
+    script = "import json, corpus; print(json.dumps(corpus.generate_corpus(200, 1)))"
+    for hash_seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=hash_seed)
+        output = subprocess.check_output([sys.executable, "-c", script],
+                                         cwd=benchmarks_dir, env=env)
+        assert json.loads(output) == corpus